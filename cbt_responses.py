@@ -117,7 +117,8 @@ def continue_grounding(sid):
     # Completed
     EXERCISE_STATE.pop(sid, None)
     return {"message": "Excellent work 🌟. You completed grounding. How do you feel now?",
-            "reason": "Close grounding.", "follow_up": "Would you like to keep talking or set a tiny goal for today?"}
+            "reason": "Close grounding.", "follow_up": "Would you like to keep talking or set a tiny goal for today?",
+            "completed": "grounding"}
 
 # Breathing
 def start_breathing(sid):
@@ -144,7 +145,8 @@ def continue_breathing(sid):
 
     EXERCISE_STATE.pop(sid, None)
     return {"message": "Well done 🌟. You completed the breathing exercise.",
-            "reason": "Close breathing.", "follow_up": "Would you like to keep talking or set a tiny goal for today?"}
+            "reason": "Close breathing.", "follow_up": "Would you like to keep talking or set a tiny goal for today?",
+            "completed": "breathing"}
 
 # Reframing
 def start_reframing(sid):
@@ -172,7 +174,8 @@ def continue_reframing(sid):
 
     EXERCISE_STATE.pop(sid, None)
     return {"message": "Great work 🌟. You completed the reframing exercise. How do you feel now?",
-            "reason": "Close reframing.", "follow_up": "Would you like to keep talking or set a tiny goal for today?"}
+            "reason": "Close reframing.", "follow_up": "Would you like to keep talking or set a tiny goal for today?",
+            "completed": "reframing"}
 
 # ---------------------------------
 # Dispatcher (progressive flow)
@@ -40,7 +40,7 @@ def check_crisis(text: str) -> bool:
     if not text:
         return False
 
-    t = text.lower()
+    t = _fold_quotes(text).lower()
 
     # Check regex patterns
     if any(re.search(p, t) for p in CRISIS_PATTERNS):
@@ -53,6 +53,91 @@ def check_crisis(text: str) -> bool:
     return False
 
 
+# -------------------------------------------------
+# Cross-turn scanning ("I can't" / "go on anymore")
+# -------------------------------------------------
+
+# Phrases that are safe to join across a message boundary: the previous
+# message must END with the unfinished opener and the new one must START
+# with the completion. Reusing CRISIS_PATTERNS here would bridge ordinary
+# sentences ("...to the end" / "it was nice").
+# Filler words allowed between the subject and the verb ("i just want to")
+_FILLER = r"(?:(?:just|really|only|honestly|simply)[\s,]*)*"
+
+SPLIT_PHRASES = [
+    (r"\bi\s*" + _FILLER + r"(can't|cant|cannot)", r"(go\s*on|keep\s*going|take\s*(it|this)|do\s*this\s*any\s*more)\b"),
+    (r"\bi\s*" + _FILLER + r"(want|need|wanna)\s*to", r"(die|end\s*(it|it\s*all|my\s*life)|kill\s*myself|hurt\s*myself)\b"),
+    (r"\b(going|planning)\s*to", r"(kill\s*myself|end\s*(it|it\s*all|my\s*life)|hurt\s*myself)\b"),
+    (r"\b(want|going)\s*to\s*end", r"(it|it\s*all|my\s*life)\b"),
+    (r"\b(better|be)\s*off", r"(dead|without\s*me)\b"),
+    (r"\bno\s*reason", r"to\s*live\b"),
+    (r"\btired\s*of", r"(living|being\s*alive)\b"),
+    (r"\b(kill|hurt)", r"myself\b"),
+]
+
+_SPLIT_PATTERNS = [(re.compile(a + r"$"), re.compile(r"^" + b)) for a, b in SPLIT_PHRASES]
+
+# Only the end of the previous message can open a split phrase
+TAIL_CHARS = 40
+
+# _SCAN_STATE[sid] = {"turn": int, "prev": (turn, tail) or None}
+_SCAN_STATE = {}
+
+
+def _fold_quotes(text: str) -> str:
+    # Phones and macOS type curly apostrophes ("can’t"); patterns use '
+    return text.replace("\u2019", "'").replace("\u2018", "'")
+
+
+def _normalize(text: str) -> str:
+    return " ".join(_fold_quotes(text or "").lower().split())
+
+
+def _open_tail(text: str) -> str:
+    """
+    The end of a message if it was left unfinished, else "". A full stop,
+    question or exclamation mark closes the thought; trailing commas,
+    dashes and ellipses keep it open.
+    """
+    t = text.rstrip()
+    if t.endswith("..."):
+        t = t.rstrip(".")
+    t = t.rstrip(" ,-\u2013\u2014\u2026")
+    if not t or t[-1] in ".!?":
+        return ""
+    return t[-TAIL_CHARS:]
+
+
+def scan_turn(sid: str, text: str):
+    """
+    Feed one user message into the session's stream and look for a crisis
+    phrase opened at the end of the previous message and completed at the
+    start of this one. Work is O(len(text)); phrases wholly inside this
+    message are left to check_crisis.
+    Returns {"phrase": str, "turns": [int, ...]} or None.
+    """
+    state = _SCAN_STATE.setdefault(sid, {"turn": 0, "prev": None})
+    state["turn"] += 1
+    turn = state["turn"]
+    current = _normalize(text)
+
+    hit = None
+    if state["prev"] and current:
+        prev_turn, tail = state["prev"]
+        for opener, completion in _SPLIT_PATTERNS:
+            a = opener.search(tail)
+            if not a:
+                continue
+            b = completion.match(current)
+            if b:
+                hit = {"phrase": f"{a.group(0)} {b.group(0)}", "turns": [prev_turn, turn]}
+                break
+
+    tail = _open_tail(current)
+    state["prev"] = (turn, tail) if tail else None
+    return hit
+
+
 def get_crisis_message() -> str:
     """
     Returns the crisis support message shown to the user
@@ -0,0 +1,68 @@
+import gc
+import os
+import time
+
+# -------------------------------------------------
+# Gunicorn settings (picked up automatically by `gunicorn main:app`)
+# -------------------------------------------------
+
+_BOOT = time.monotonic()
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+# More than one thread switches gunicorn to gthread workers; per-session
+# state is guarded by session_locks so this is safe. Each open /ws
+# connection holds a thread for its lifetime, so keep this well above
+# WS_MAX_CONNECTIONS (default 24): the difference is what is left for
+# page loads, the POST /chat fallback and crisis turns.
+threads = int(os.getenv("GUNICORN_THREADS", "32"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+
+# Import main.py (and load the model) once in the master, then fork.
+# Weights live in tensor storage that workers only read, so the pages
+# stay shared copy-on-write instead of being loaded N times.
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+
+
+def _mem_kb():
+    """(rss, pss) in kB for this process; pss splits shared pages fairly."""
+    rss = pss = 0
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Rss:"):
+                    rss = int(line.split()[1])
+                elif line.startswith("Pss:"):
+                    pss = int(line.split()[1])
+    except OSError:
+        pass
+    return rss, pss
+
+
+def when_ready(server):
+    # Runs after preload, right before the first fork. Moving everything
+    # allocated so far into the permanent generation stops the cyclic GC
+    # from touching (and so copying) those pages in every worker.
+    if preload_app:
+        gc.collect()
+        gc.freeze()
+    rss, pss = _mem_kb()
+    server.log.info(f"Master ready in {time.monotonic() - _BOOT:.2f}s "
+                    f"(preload={preload_app}, rss={rss}kB, pss={pss}kB)")
+
+
+def post_fork(server, worker):
+    # Let the backend fix up anything that must not be shared across
+    # fork: torch thread pools, HTTP connection pools.
+    if preload_app:
+        import main
+        hook = getattr(main.backend, "after_fork", None)
+        if hook:
+            # cfg reflects -w/--workers too, not just WEB_CONCURRENCY
+            hook(server.cfg.workers)
+
+
+def post_worker_init(worker):
+    rss, pss = _mem_kb()
+    worker.log.info(f"Worker {worker.pid} up at {time.monotonic() - _BOOT:.2f}s "
+                    f"(rss={rss}kB, pss={pss}kB)")
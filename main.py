@@ -1,26 +1,54 @@
-from flask import Flask, render_template, request, jsonify, session
-from datetime import datetime
+from flask import Flask, render_template, request, jsonify, session, g
+from datetime import datetime, timezone
 from collections import defaultdict
+from bisect import bisect_right
 from mood_detection import get_mood
-from crisis_detection import check_crisis, get_crisis_message
-from personalization import personalize_response
+from crisis_detection import check_crisis, get_crisis_message, scan_turn
+from personalization import personalize_response, reply_budget
 from cbt_responses import get_cbt_response
 from services.backends import get_backend
-import os, uuid, json, random  # <- add random
+from services.admission import AdmissionController
+from session_summary import start_session, record_turn, summary_payload
+from session_locks import session_lock, LOG_LOCK
+from profiling import init_profiling
+import os, re, uuid, json, random, time, threading, queue
 
 app = Flask(__name__)
 app.secret_key = os.getenv("SECRET_KEY", "dev-secret")
+init_profiling(app)
+
+# Optional WebSocket transport; the page falls back to POST /chat without it
+try:
+    from flask_sock import Sock
+    sock = Sock(app)
+except Exception as e:
+    sock = None
+    print(f"WebSocket transport disabled: {e}", flush=True)
 
 # Initialize backend once
 backend = get_backend()
+admission = AdmissionController.for_backend(backend)
 
 # In-memory session stores
 USER_PREFS = {}
+# First-turn state lives server side: a /ws turn cannot set cookies
+SESSION_FLAGS = defaultdict(lambda: {"greeted": False, "last_user": ""})
 USER_NOTES = defaultdict(list)
 USER_GOALS = defaultdict(list)
 USER_HISTORY = defaultdict(list)  # list of {role: "user"|"assistant", content: str}
 CRISIS_MODE = set()
 
+# Bumped on every change to a session's notes/goals; feeds the ETag
+LIST_VERSIONS = defaultdict(int)  # (kind, sid) -> int
+# Every create/update per session list, in order: (updated, id). Lets
+# `since` pick up edits (e.g. a goal marked done), not just new entries.
+CHANGE_LOG = defaultdict(list)  # (kind, sid) -> [(iso time, id)]
+# Index of the earliest goal that is not done, so goal_nudge never scans
+FIRST_OPEN_GOAL = defaultdict(int)
+
+PAGE_SIZE = int(os.getenv("PAGE_SIZE", "50"))
+MAX_PAGE_SIZE = 200
+
 LOG_FILE = os.getenv("CHAT_LOG_FILE", "chat_logs.jsonl")
 
 
@@ -28,6 +56,7 @@ LOG_FILE = os.getenv("CHAT_LOG_FILE", "chat_logs.jsonl")
 def sid():
     if "sid" not in session:
         session["sid"] = str(uuid.uuid4())
+        start_session(session["sid"])
     return session["sid"]
 
 
@@ -46,14 +75,98 @@ def build_system_prompt(last_user_msg, history):
     return base
 
 
+def _advance_first_open(this_sid):
+    goals = USER_GOALS[this_sid]
+    i = FIRST_OPEN_GOAL[this_sid]
+    while i < len(goals) and goals[i].get("done"):
+        i += 1
+    FIRST_OPEN_GOAL[this_sid] = i
+
+
 def goal_nudge(this_sid):
-    open_goals = [g for g in USER_GOALS[this_sid] if not g.get("done")]
-    if open_goals:
-        return f'\n\nLast time you set: "{open_goals[0]["goal"]}". Any tiny step today?'
+    goals = USER_GOALS[this_sid]
+    i = FIRST_OPEN_GOAL[this_sid]
+    if i < len(goals):
+        return f'\n\nLast time you set: "{goals[i]["goal"]}". Any tiny step today?'
     return ""
 
 
-def log_interaction(this_sid, user_message, bot_reply, mood, crisis=False, backend_used="unknown"):
+def _touch(kind, this_sid, entry):
+    entry["updated"] = datetime.utcnow().isoformat()
+    CHANGE_LOG[(kind, this_sid)].append((entry["updated"], entry["id"]))
+    LIST_VERSIONS[(kind, this_sid)] += 1
+
+
+def _page_args():
+    """
+    Read cursor/limit/since from the query string.
+    cursor: opaque position from a previous next_cursor.
+    since: ISO timestamp; only entries created or updated after it are returned.
+    """
+    try:
+        cursor = max(0, int(request.args.get("cursor", 0)))
+    except ValueError:
+        cursor = 0
+    try:
+        limit = int(request.args.get("limit", PAGE_SIZE))
+    except ValueError:
+        limit = PAGE_SIZE
+    limit = min(max(1, limit), MAX_PAGE_SIZE)
+    since = request.args.get("since") or ""
+    if since:
+        # Raises ValueError on garbage; stored times are naive UTC
+        parsed = datetime.fromisoformat(since)
+        if parsed.tzinfo is not None:
+            parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+        since = parsed.isoformat()
+    return cursor, limit, since
+
+
+def list_response(kind, this_sid, items):
+    """
+    Paginated, conditional GET over an append-only list.
+    Without `since`, entry ids equal their list index and a cursor is a
+    slice offset. With `since`, pages walk the change log from a binary
+    search over its (monotonic) times, so the cursor is a change-log
+    offset and each entry appears once, at its latest change.
+    """
+    try:
+        cursor, limit, since = _page_args()
+    except ValueError:
+        return jsonify({"error": "since must be an ISO 8601 timestamp"}), 400
+    etag = f"{kind}-{LIST_VERSIONS[(kind, this_sid)]}-{cursor}-{limit}-{since}"
+    if request.if_none_match.contains(etag):
+        resp = app.response_class(status=304)
+        resp.set_etag(etag)
+        return resp
+
+    if since:
+        changes = CHANGE_LOG[(kind, this_sid)]
+        i = max(cursor, bisect_right(changes, since, key=lambda c: c[0]))
+        page = []
+        seen = set()
+        while i < len(changes) and len(page) < limit:
+            changed_at, entry_id = changes[i]
+            entry = items[entry_id]
+            # Older records for an entry that changed again are skipped
+            if entry["updated"] == changed_at and entry_id not in seen:
+                seen.add(entry_id)
+                page.append(entry)
+            i += 1
+        next_cursor = i if i < len(changes) else None
+    else:
+        page = items[cursor:cursor + limit]
+        next_cursor = cursor + limit if cursor + limit < len(items) else None
+
+    resp = jsonify({kind: page, "next_cursor": next_cursor, "total": len(items)})
+    resp.set_etag(etag)
+    return resp
+
+
+def log_interaction(this_sid, user_message, bot_reply, mood, crisis=False, backend_used="unknown", exercise=None):
+    # Every turn ends here, so keep the session recap in step with the log
+    g.backend_used = backend_used
+    record_turn(this_sid, LOG_FILE, user_message, mood, crisis=crisis, exercise=exercise)
     entry = {
         "sid": this_sid,
         "ts": datetime.utcnow().isoformat(),
@@ -63,8 +176,10 @@ def log_interaction(this_sid, user_message, bot_reply, mood, crisis=False, backe
         "crisis": crisis,
         "backend": backend_used,
     }
+    if exercise:
+        entry["exercise"] = exercise
     try:
-        with open(LOG_FILE, "a", encoding="utf-8") as f:
+        with LOG_LOCK, open(LOG_FILE, "a", encoding="utf-8") as f:
             f.write(json.dumps(entry) + "\n")
     except Exception as e:
         print(f"Log error: {e}", flush=True)
@@ -109,6 +224,8 @@ def combine_with_intro(intro: str, reply: str, last_bot_message: str = "") -> st
 # ---------------- Routes ----------------
 @app.route("/")
 def home():
+    # Mint the session cookie here so a later WebSocket upgrade carries it
+    sid()
     return render_template("index.html")
 
 
@@ -119,132 +236,349 @@ def chat():
     if not user_message:
         return jsonify({"response": "Please type a message to start.", "mood": "neutral"})
 
-    this_sid = sid()
-    prefs = USER_PREFS.get(this_sid, {"tone": "friendly", "memory_opt_in": False})
+    return jsonify(_chat_turn(sid(), user_message))
+
 
-    # Ensure first-turn flags
-    if "greeted" not in session:
-        session["greeted"] = False
-    if "last_user" not in session:
-        session["last_user"] = ""
+def _crisis_reply(this_sid, user_message, mood, cross_turn=None):
+    crisis_msg = get_crisis_message()
+    USER_HISTORY[this_sid].append({"role": "assistant", "content": crisis_msg})
+    log_interaction(this_sid, user_message, crisis_msg, mood, crisis=True, backend_used="crisis")
+    payload = {"response": crisis_msg, "mood": mood, "crisis": True}
+    if cross_turn:
+        payload["crisis_turns"] = cross_turn["turns"]
+    return payload
 
-    # Append user message to history first
-    USER_HISTORY[this_sid].append({"role": "user", "content": user_message})
 
+def _chat_turn(this_sid, user_message):
+    """
+    One conversation turn; returns the reply payload for any transport.
+    The session lock covers the state changes before and after the model
+    call but not the call itself, so a crisis message is never queued
+    behind a generation, even one for the same session.
+    """
+    lock = session_lock(this_sid)
     mood = get_mood(user_message)
 
-    # Crisis check – remains first
-    if check_crisis(user_message):
-        CRISIS_MODE.add(this_sid)
-        crisis_msg = get_crisis_message()
-        USER_HISTORY[this_sid].append({"role": "assistant", "content": crisis_msg})
-        log_interaction(this_sid, user_message, crisis_msg, mood, crisis=True, backend_used="crisis")
-        return jsonify({"response": crisis_msg, "mood": mood, "crisis": True})
-
-    if this_sid in CRISIS_MODE:
-        crisis_msg = get_crisis_message()
-        USER_HISTORY[this_sid].append({"role": "assistant", "content": crisis_msg})
-        log_interaction(this_sid, user_message, crisis_msg, mood, crisis=True, backend_used="crisis")
-        return jsonify({"response": crisis_msg, "mood": mood, "crisis": True})
-
-    # One-time friendly greeting when the first real message is a greeting
-    if not session["greeted"]:
-        lw = user_message.lower()
-        if any(w in lw for w in ["hi", "hello", "hey", "good morning", "good evening", "good afternoon"]):
-            session["greeted"] = True
-            greet = random.choice([
-                "Hi there. I am glad you reached out. How are you feeling today?",
-                "Hello. I am here with you. What is on your mind?",
-                "Hey. Thanks for saying hi. How is your day going so far?"
-            ])
-            USER_HISTORY[this_sid].append({"role": "assistant", "content": greet})
-            session["last_user"] = user_message
-            log_interaction(this_sid, user_message, greet, mood, crisis=False, backend_used="greeting")
-            return jsonify({"response": greet, "mood": "neutral"})
-        # mark as greeted to avoid rechecking every turn
-        session["greeted"] = True
-
-    # Personalize intro and system prompt
-    last_user = session.get("last_user")
-    system_prompt = build_system_prompt(last_user, USER_HISTORY[this_sid])
-    intro = personalize_response(user_message, mood, prefs.get("tone", "friendly"))
-
-    # Try model backend
+    with lock:
+        prefs = USER_PREFS.get(this_sid, {"tone": "friendly", "memory_opt_in": False})
+
+        flags = SESSION_FLAGS[this_sid]
+
+        # Append user message to history first
+        USER_HISTORY[this_sid].append({"role": "user", "content": user_message})
+
+        # Crisis check – remains first. The stream is fed every turn so it can
+        # catch phrases split across messages.
+        cross_turn = scan_turn(this_sid, user_message)
+        if check_crisis(user_message) or cross_turn:
+            CRISIS_MODE.add(this_sid)
+            return _crisis_reply(this_sid, user_message, mood, cross_turn)
+
+        if this_sid in CRISIS_MODE:
+            return _crisis_reply(this_sid, user_message, mood)
+
+        # One-time friendly greeting when the first real message is a greeting
+        if not flags["greeted"]:
+            lw = user_message.lower()
+            words = set(re.findall(r"[a-z']+", lw))
+            if words & {"hi", "hello", "hey"} or \
+                    any(p in lw for p in ["good morning", "good evening", "good afternoon"]):
+                flags["greeted"] = True
+                greet = random.choice([
+                    "Hi there. I am glad you reached out. How are you feeling today?",
+                    "Hello. I am here with you. What is on your mind?",
+                    "Hey. Thanks for saying hi. How is your day going so far?"
+                ])
+                USER_HISTORY[this_sid].append({"role": "assistant", "content": greet})
+                flags["last_user"] = user_message
+                log_interaction(this_sid, user_message, greet, mood, crisis=False, backend_used="greeting")
+                return {"response": greet, "mood": "neutral"}
+            # mark as greeted to avoid rechecking every turn
+            flags["greeted"] = True
+
+        # Personalize intro and system prompt
+        last_user = flags["last_user"]
+        system_prompt = build_system_prompt(last_user, USER_HISTORY[this_sid])
+        intro = personalize_response(user_message, mood, prefs.get("tone", "friendly"))
+        # Backends read a snapshot (at most the last 5 turns); other turns
+        # may append meanwhile
+        history = USER_HISTORY[this_sid][-5:]
+
+    # Try model backend (no lock held)
     backend_used = "unknown"
     bot_text = None
+    completed = None
+    if admission.admit():
+        started = time.monotonic()
+        try:
+            bot_text = backend.reply(history, user_message, system_prompt,
+                                     budget=reply_budget(mood, prefs.get("tone", "friendly")))
+            backend_used = type(backend).__name__
+        except Exception as e:
+            print(f"Backend error: {e}", flush=True)
+        finally:
+            admission.done(time.monotonic() - started)
+
+    with lock:
+        # A crisis may have been flagged by another turn while we generated
+        if this_sid in CRISIS_MODE:
+            return _crisis_reply(this_sid, user_message, mood)
+
+        # Fallback to CBT logic
+        if not bot_text:
+            last_bot = _last_bot_message(USER_HISTORY[this_sid])
+            cbt = get_cbt_response(mood, user_message, last_bot, sid=this_sid)
+            bot_text = f'{cbt["message"]} {(cbt.get("follow_up") or "")}'.strip()
+            backend_used = "cbt"
+            completed = cbt.get("completed")
+
+        # Combine with intro, and add goal nudge if memory on
+        last_bot_before = _last_bot_message(USER_HISTORY[this_sid])
+        reply = combine_with_intro(intro, bot_text, last_bot_before)
+        if prefs.get("memory_opt_in"):
+            reply += goal_nudge(this_sid)
+
+        USER_HISTORY[this_sid].append({"role": "assistant", "content": reply})
+        flags["last_user"] = user_message
+
+        log_interaction(this_sid, user_message, reply, mood, crisis=False, backend_used=backend_used,
+                        exercise=completed)
+        return {"response": reply, "mood": mood}
+
+
+@app.route("/session-summary", methods=["GET"])
+def session_summary():
+    this_sid = sid()
+    with session_lock(this_sid):
+        return jsonify(summary_payload(this_sid, LOG_FILE))
+
+
+WS_MAX_PENDING = 32
+# Under gthread each open socket pins a worker thread for its lifetime.
+# Keep this below gunicorn's `threads` so HTTP (page loads, the POST
+# fallback, crisis turns) always has threads left; sockets past the cap
+# are closed with 1013 (try again later) and the client uses POST.
+WS_MAX_CONNECTIONS = int(os.getenv("WS_MAX_CONNECTIONS", "24"))
+_ws_open = 0
+_ws_guard = threading.Lock()
+
+
+def _ws_handle(this_sid, msg):
+    kind = msg.get("type", "chat")
+    if kind == "chat":
+        user_message = msg.get("message")
+        if not isinstance(user_message, (str, type(None))):
+            return {"type": "error", "error": "message must be a string", "seq": msg["seq"]}
+        user_message = (user_message or "").strip()
+        if not user_message:
+            payload = {"response": "Please type a message to start.", "mood": "neutral"}
+        else:
+            payload = _chat_turn(this_sid, user_message)
+        kind = "crisis" if payload.get("crisis") else "reply"
+    elif kind == "summary":
+        with session_lock(this_sid):
+            payload = summary_payload(this_sid, LOG_FILE)
+    else:
+        payload = {"error": f"unknown message type: {kind}"}
+        kind = "error"
+    return dict(payload, type=kind, seq=msg["seq"])
+
+
+def _ws_reply(this_sid, msg):
+    # A failed turn answers its own seq and leaves the socket open
     try:
-        bot_text = backend.reply(USER_HISTORY[this_sid], user_message, system_prompt)
-        backend_used = type(backend).__name__
+        return json.dumps(_ws_handle(this_sid, msg))
     except Exception as e:
-        print(f"Backend error: {e}", flush=True)
+        print(f"WebSocket turn failed: {e}", flush=True)
+        return _ws_error("could not process message", msg["seq"])
 
-    # Fallback to CBT logic
-    if not bot_text:
-        last_bot = _last_bot_message(USER_HISTORY[this_sid])
-        cbt = get_cbt_response(mood, user_message, last_bot, sid=this_sid)
-        bot_text = f'{cbt["message"]} {(cbt.get("follow_up") or "")}'.strip()
-        backend_used = "cbt"
 
-    # Combine with intro, and add goal nudge if memory on
-    last_bot_before = _last_bot_message(USER_HISTORY[this_sid])
-    reply = combine_with_intro(intro, bot_text, last_bot_before)
-    if prefs.get("memory_opt_in"):
-        reply += goal_nudge(this_sid)
+def _ws_is_crisis(msg):
+    text = msg.get("message")
+    return msg.get("type", "chat") == "chat" and isinstance(text, str) and check_crisis(text)
 
-    USER_HISTORY[this_sid].append({"role": "assistant", "content": reply})
-    session["last_user"] = user_message
 
-    log_interaction(this_sid, user_message, reply, mood, crisis=False, backend_used=backend_used)
-    return jsonify({"response": reply, "mood": mood})
+def ws_chat(ws):
+    """
+    One connection per session. Client frames are JSON with a 1-based
+    "seq"; they are answered in seq order, so a client may keep several
+    messages in flight. Replies, summaries and crisis notices all come
+    back on this socket tagged with the seq they answer. A message that
+    trips the crisis check is answered as soon as it arrives, ahead of
+    any generation still running for earlier frames.
+    """
+    global _ws_open
+    with _ws_guard:
+        admitted = _ws_open < WS_MAX_CONNECTIONS
+        if admitted:
+            _ws_open += 1
+    if not admitted:
+        ws.close(reason=1013, message="Too many open sockets, use HTTP")
+        return
+    try:
+        _ws_serve(ws, sid())
+    finally:
+        with _ws_guard:
+            _ws_open -= 1
 
 
-@app.route("/session-summary", methods=["GET"])
-def session_summary():
-    this_sid = sid()
-    recent_user_msgs = [h["content"] for h in USER_HISTORY[this_sid] if h["role"] == "user"][-8:]
-    if not recent_user_msgs:
-        return jsonify({"response": "We have not chatted yet. Say hi to start.", "mood": "neutral"})
-    bullets = "\n".join([f"• {m}" for m in recent_user_msgs])
-    summary = f"Here is a quick recap of what you shared today:\n{bullets}\n\nWould you like a small next step to try?"
-    return jsonify({"response": summary, "mood": "neutral"})
+def _ws_error(error, seq=None):
+    # Echo the seq when there is one so the client can settle that request
+    frame = {"type": "error", "error": error}
+    if isinstance(seq, int):
+        frame["seq"] = seq
+    return json.dumps(frame)
+
+
+def _ws_serve(ws, this_sid):
+    """
+    The receive loop only parses, orders and screens frames; turns run on
+    a per-socket thread so a long generation never holds up reading the
+    next frame. Crisis messages skip that queue: they go straight through
+    _chat_turn here, which needs the session lock only around state
+    changes, and the turn thread later skips their seq.
+    """
+    send_lock = threading.Lock()
+    turns = queue.Queue()
+    closed = threading.Event()
+
+    def send(frame):
+        with send_lock:
+            ws.send(frame)
+
+    def run_turns():
+        with app.app_context():
+            while True:
+                msg = turns.get()
+                # Nobody is left to read replies to frames still queued
+                if msg is None or closed.is_set():
+                    return
+                try:
+                    send(_ws_reply(this_sid, msg))
+                except Exception:
+                    closed.set()
+
+    worker = threading.Thread(target=run_turns, daemon=True)
+    worker.start()
+    expected = 1
+    pending = {}
+    answered = set()
+    try:
+        while True:
+            data = ws.receive()
+            if data is None:
+                break
+            try:
+                msg = json.loads(data)
+            except ValueError:
+                send(_ws_error("invalid JSON"))
+                continue
+            seq = msg.get("seq") if isinstance(msg, dict) else None
+            if not isinstance(seq, int) or isinstance(seq, bool) or seq < expected \
+                    or seq in pending or seq in answered:
+                send(_ws_error("missing or stale seq", seq))
+                continue
+            if _ws_is_crisis(msg):
+                send(_ws_reply(this_sid, msg))
+                answered.add(seq)
+            else:
+                pending[seq] = msg
+            if len(pending) + len(answered) > WS_MAX_PENDING:
+                send(_ws_error("too many messages out of order", seq))
+                break
+            while expected in pending or expected in answered:
+                if expected in pending:
+                    turns.put(pending.pop(expected))
+                answered.discard(expected)
+                expected += 1
+    finally:
+        closed.set()
+        turns.put(None)
+        worker.join()
+
+
+if sock:
+    sock.route("/ws")(ws_chat)
 
 
 @app.route("/notes", methods=["GET", "POST"])
 def notes():
     this_sid = sid()
-    if request.method == "POST":
-        note = (request.get_json(silent=True) or {}).get("note", "").strip()
-        if note:
-            USER_NOTES[this_sid].append({"note": note, "time": datetime.utcnow().isoformat()})
-    return jsonify({"notes": USER_NOTES[this_sid]})
+    with session_lock(this_sid):
+        if request.method == "POST":
+            note = (request.get_json(silent=True) or {}).get("note", "").strip()
+            if not note:
+                return jsonify({"error": "note is required"}), 400
+            entry = {"id": len(USER_NOTES[this_sid]), "note": note, "time": datetime.utcnow().isoformat()}
+            USER_NOTES[this_sid].append(entry)
+            _touch("notes", this_sid, entry)
+            return jsonify({"note": entry}), 201
+        return list_response("notes", this_sid, USER_NOTES[this_sid])
 
 
 @app.route("/goals", methods=["GET", "POST"])
 def goals():
     this_sid = sid()
-    if request.method == "POST":
-        data = request.get_json(silent=True) or {}
-        goal_text = data.get("goal", "").strip()
-        if goal_text:
-            USER_GOALS[this_sid].append({"goal": goal_text, "time": datetime.utcnow().isoformat(), "done": False})
-    return jsonify({"goals": USER_GOALS[this_sid]})
+    with session_lock(this_sid):
+        if request.method == "POST":
+            data = request.get_json(silent=True) or {}
+            goal_text = data.get("goal", "").strip()
+            if not goal_text:
+                return jsonify({"error": "goal is required"}), 400
+            entry = {"id": len(USER_GOALS[this_sid]), "goal": goal_text,
+                     "time": datetime.utcnow().isoformat(), "done": False}
+            USER_GOALS[this_sid].append(entry)
+            _touch("goals", this_sid, entry)
+            return jsonify({"goal": entry}), 201
+        return list_response("goals", this_sid, USER_GOALS[this_sid])
+
+
+@app.route("/goals/<int:goal_id>", methods=["PATCH"])
+def update_goal(goal_id):
+    this_sid = sid()
+    with session_lock(this_sid):
+        goals = USER_GOALS[this_sid]
+        if goal_id >= len(goals):
+            return jsonify({"error": "goal not found"}), 404
+        data = request.get_json(silent=True)
+        if data is None:
+            data = {}
+        if not isinstance(data, dict):
+            return jsonify({"error": "body must be a JSON object"}), 400
+        done = data.get("done", True)
+        if not isinstance(done, bool):
+            return jsonify({"error": "done must be true or false"}), 400
+        goal = goals[goal_id]
+        goal["done"] = done
+        _touch("goals", this_sid, goal)
+
+        # Keep the first-open pointer exact: reopening can move it back
+        if not goal["done"]:
+            FIRST_OPEN_GOAL[this_sid] = min(FIRST_OPEN_GOAL[this_sid], goal_id)
+        else:
+            _advance_first_open(this_sid)
+        return jsonify({"goal": goal})
 
 
 @app.route("/preferences", methods=["GET", "POST"])
 def preferences():
     this_sid = sid()
-    if request.method == "POST":
-        prefs = request.get_json(silent=True) or {}
-        USER_PREFS[this_sid] = {
-            "tone": prefs.get("tone", "friendly"),
-            "memory_opt_in": bool(prefs.get("memory_opt_in", False)),
-        }
-    return jsonify(USER_PREFS.get(this_sid, {}))
+    with session_lock(this_sid):
+        if request.method == "POST":
+            prefs = request.get_json(silent=True) or {}
+            USER_PREFS[this_sid] = {
+                "tone": prefs.get("tone", "friendly"),
+                "memory_opt_in": bool(prefs.get("memory_opt_in", False)),
+            }
+        return jsonify(USER_PREFS.get(this_sid, {}))
 
 
 @app.route("/health")
 def health():
-    return jsonify({"backend": type(backend).__name__})
+    info = {"backend": type(backend).__name__, "admission": admission.stats()}
+    if hasattr(backend, "stats"):
+        info.update(backend.stats())
+    return jsonify(info)
 
 
 if __name__ == "__main__":
@@ -55,3 +55,13 @@ def personalize_response(text: str, mood: str, tone: str = "friendly") -> str:
     pool = styles.get(mood, styles["neutral"])
     return random.choice(pool) + " "
 
+
+def reply_budget(mood: str, tone: str = "friendly") -> dict:
+    """
+    How long the model reply may be. The system prompt asks for 2 to 3
+    short sentences: sad and anxious turns get the third sentence (room
+    for reassurance plus a technique), formal tone gets longer sentences.
+    """
+    sentences = 3 if mood in ("sad", "anxious") else 2
+    tokens_per_sentence = 24 if tone == "formal" else 20
+    return {"sentences": sentences, "max_tokens": sentences * tokens_per_sentence + 10}
@@ -0,0 +1,159 @@
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+
+from flask import g, request, jsonify, abort
+
+# -------------------------------------------------
+# Opt-in sampling profiler for request handlers
+# -------------------------------------------------
+# PROFILE_SAMPLE_RATE: fraction of requests to profile (0 = never)
+# PROFILE_TOKEN: enables on-demand profiling via the X-Profile header and
+#                the /admin/profiles endpoints (sent as X-Admin-Token)
+# With neither set no hooks are installed, so requests pay nothing.
+
+SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+TOKEN = os.getenv("PROFILE_TOKEN", "")
+INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.005"))
+RING_SIZE = int(os.getenv("PROFILE_RING", "50"))
+
+PROFILES = deque(maxlen=RING_SIZE)
+_lock = threading.Lock()
+_armed = 0  # requests still to profile after an admin request
+_next_id = 0
+
+
+class StackSampler:
+    """Samples one thread's Python stack on a timer into collapsed stacks."""
+
+    def __init__(self, thread_id, interval=INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+
+def collapsed(stacks) -> str:
+    """Brendan Gregg's folded format: `frame;frame;frame count` per line."""
+    return "\n".join(f"{stack} {count}" for stack, count in stacks.most_common()) + "\n"
+
+
+def _authorized() -> bool:
+    return bool(TOKEN) and request.headers.get("X-Admin-Token") == TOKEN
+
+
+def _should_profile() -> bool:
+    global _armed
+    if request.path.startswith("/admin/") or request.path.startswith("/static/"):
+        return False
+    if TOKEN and request.headers.get("X-Profile") == TOKEN:
+        return True
+    if _armed:
+        with _lock:
+            if _armed:
+                _armed -= 1
+                return True
+    return SAMPLE_RATE > 0 and random.random() < SAMPLE_RATE
+
+
+def _start():
+    if _should_profile():
+        g.profiler = StackSampler(threading.get_ident())
+        g.profile_started = time.perf_counter()
+        g.profiler.start()
+
+
+def _finish(response):
+    global _next_id
+    sampler = g.pop("profiler", None)
+    if sampler is None:
+        return response
+    sampler.stop()
+    with _lock:
+        _next_id += 1
+        PROFILES.append({
+            "id": _next_id,
+            "ts": datetime.utcnow().isoformat(),
+            "route": request.endpoint,
+            "backend": g.get("backend_used", "none"),
+            "status": response.status_code,
+            "duration_ms": round((time.perf_counter() - g.profile_started) * 1000, 2),
+            "samples": sum(sampler.stacks.values()),
+            "stacks": sampler.stacks,
+        })
+    return response
+
+
+def _summary(p):
+    return {k: v for k, v in p.items() if k != "stacks"}
+
+
+def init_profiling(app):
+    if not SAMPLE_RATE and not TOKEN:
+        return
+
+    app.before_request(_start)
+    app.after_request(_finish)
+
+    if not TOKEN:
+        return
+
+    @app.route("/admin/profiles", methods=["GET", "POST"])
+    def admin_profiles():
+        global _armed
+        if not _authorized():
+            abort(404)
+        if request.method == "POST":
+            n = (request.get_json(silent=True) or {}).get("next", 1)
+            # bool is an int subclass; reject it along with strings/floats
+            if not isinstance(n, int) or isinstance(n, bool) or n < 0:
+                return jsonify({"error": "next must be a non-negative integer"}), 400
+            with _lock:
+                _armed = n
+            return jsonify({"armed": _armed})
+        with _lock:
+            return jsonify({"profiles": [_summary(p) for p in PROFILES], "armed": _armed})
+
+    @app.route("/admin/profiles/folded", methods=["GET"])
+    @app.route("/admin/profiles/<int:profile_id>/folded", methods=["GET"])
+    def admin_profile_folded(profile_id=None):
+        if not _authorized():
+            abort(404)
+        route = request.args.get("route")
+        backend = request.args.get("backend")
+        merged = Counter()
+        with _lock:
+            for p in PROFILES:
+                if profile_id is not None and p["id"] != profile_id:
+                    continue
+                if route and p["route"] != route:
+                    continue
+                if backend and p["backend"] != backend:
+                    continue
+                merged.update(p["stacks"])
+        if profile_id is not None and not merged:
+            abort(404)
+        return collapsed(merged), 200, {"Content-Type": "text/plain; charset=utf-8"}
@@ -0,0 +1,88 @@
+import os
+import threading
+import time
+from collections import deque
+
+
+class AdmissionController:
+    """
+    Decides per turn whether the model backend may be called. When too
+    many calls are in flight, or recent calls were slow, the turn is shed
+    to the deterministic CBT fallback instead of queueing behind the model.
+    Crisis turns are answered before this point, and the session lock is
+    not held during model calls, so crisis replies are never shed or
+    queued behind a generation (see tests/load_admission.py).
+    """
+
+    def __init__(self, max_in_flight=None, max_latency=None, window=None):
+        # Limits are opt-in: 0 disables a check (see for_backend for defaults)
+        self.max_in_flight = int(max_in_flight if max_in_flight is not None
+                                 else os.getenv("ADMISSION_MAX_IN_FLIGHT", "0"))
+        self.max_latency = float(max_latency if max_latency is not None
+                                 else os.getenv("ADMISSION_MAX_LATENCY", "0"))
+        # Latency samples older than this stop counting, so a slow spike
+        # cannot shed traffic forever once nothing is admitted.
+        self.window = float(window if window is not None
+                            else os.getenv("ADMISSION_WINDOW", "30"))
+        self._lock = threading.Lock()
+        self._samples = deque(maxlen=50)  # (finished_at, seconds)
+        self.in_flight = 0
+        self.admitted = 0
+        self.shed = 0
+        self.shed_in_flight = 0
+        self.shed_latency = 0
+
+    @classmethod
+    def for_backend(cls, backend):
+        """
+        Defaults that match the backend. Only the local model saturates: it
+        gets one call per generation slot and an 8s latency ceiling. Network
+        backends (OpenAI) handle many concurrent calls and run unlimited.
+        ADMISSION_* env vars override either way.
+        """
+        max_in_flight = max_latency = None
+        if type(backend).__name__ == "HuggingFaceBackend":
+            if "ADMISSION_MAX_IN_FLIGHT" not in os.environ:
+                max_in_flight = int(os.getenv("HF_SLOTS", "1"))
+            if "ADMISSION_MAX_LATENCY" not in os.environ:
+                max_latency = 8.0
+        return cls(max_in_flight=max_in_flight, max_latency=max_latency)
+
+    def _recent_latency(self, now):
+        while self._samples and now - self._samples[0][0] > self.window:
+            self._samples.popleft()
+        if not self._samples:
+            return 0.0
+        return sum(s for _, s in self._samples) / len(self._samples)
+
+    def admit(self) -> bool:
+        with self._lock:
+            if self.max_in_flight and self.in_flight >= self.max_in_flight:
+                self.shed += 1
+                self.shed_in_flight += 1
+                return False
+            if self.max_latency and self._recent_latency(time.monotonic()) > self.max_latency:
+                self.shed += 1
+                self.shed_latency += 1
+                return False
+            self.in_flight += 1
+            self.admitted += 1
+            return True
+
+    def done(self, seconds: float):
+        with self._lock:
+            self.in_flight -= 1
+            self._samples.append((time.monotonic(), seconds))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "in_flight": self.in_flight,
+                "admitted": self.admitted,
+                "shed": self.shed,
+                "shed_in_flight": self.shed_in_flight,
+                "shed_latency": self.shed_latency,
+                "recent_latency": round(self._recent_latency(time.monotonic()), 3),
+                "max_in_flight": self.max_in_flight,
+                "max_latency": self.max_latency,
+            }
@@ -1,9 +1,144 @@
 import os
+import re
+import threading
+import time
+
+# Sentence end: terminal punctuation followed by whitespace or end of text
+_SENTENCE_END = re.compile(r"[.!?]+(?=\s|$)")
+
+# Previous fixed decode limits, used to report what the budgets save
+OPENAI_MAX_TOKENS = 220
+HF_MAX_NEW_TOKENS = 70
+
+
+def count_sentences(text: str) -> int:
+    return len(_SENTENCE_END.findall(text or ""))
+
+
+def trim_sentences(text: str, sentences: int, cut_off: bool = False) -> str:
+    """
+    Keep the first `sentences` complete sentences. A reply with fewer is
+    kept whole if it ended on its own; if the token cap or deadline cut it
+    off, the dangling fragment is dropped back to the last full sentence.
+    """
+    text = (text or "").strip()
+    last = 0
+    for i, m in enumerate(_SENTENCE_END.finditer(text)):
+        last = m.end()
+        if i + 1 == sentences:
+            return text[:last].strip()
+    if cut_off and last:
+        return text[:last].strip()
+    return text
+
+
+class DecodeStats:
+    """
+    Running totals of decode tokens spent, and of what the sentence stop
+    could have saved. Only replies the sentence criterion actually ended
+    count towards the saving, and it is an upper bound: without the stop
+    the model may still have ended before the old fixed ceiling.
+    """
+
+    def __init__(self, ceiling):
+        self.ceiling = ceiling
+        self._lock = threading.Lock()
+        self.replies = 0
+        self.sentence_stops = 0
+        self.cut_off = 0
+        self.tokens = 0
+        self.tokens_saved = 0
+        self.seconds = 0.0
+
+    def record(self, tokens, seconds, sentence_stop=False, cut_off=False):
+        with self._lock:
+            self.replies += 1
+            self.tokens += tokens
+            self.seconds += seconds
+            if sentence_stop:
+                self.sentence_stops += 1
+                self.tokens_saved += max(0, self.ceiling - tokens)
+            elif cut_off:
+                self.cut_off += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            per_token = self.seconds / self.tokens if self.tokens else 0.0
+            n = self.replies or 1
+            return {
+                "replies": self.replies,
+                "sentence_stops": self.sentence_stops,
+                "cut_off": self.cut_off,
+                "avg_decode_tokens": round(self.tokens / n, 1),
+                "avg_tokens_saved_max": round(self.tokens_saved / n, 1),
+                # Estimated from the observed per-token decode time
+                "avg_seconds_saved_max": round(per_token * self.tokens_saved / n, 3),
+            }
+
+
+class AssistStats:
+    """
+    Acceptance for assisted decoding, measured by counting the main
+    model's forward passes. Each pass verifies the proposed tokens it was
+    given and yields the accepted ones plus one of its own. Fewer passes
+    is not by itself a speedup (the draft model and the wider verify
+    passes cost time too); compare ms_per_token with HF_ASSIST off, or
+    run tests/bench_inference.py --assist.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.replies = 0
+        self.tokens = 0
+        self.forwards = 0
+        self.proposed = 0
+        self.seconds = 0.0
+
+    def hook(self, module, args, kwargs):
+        ids = kwargs.get("input_ids", args[0] if args else None)
+        if ids is None or not getattr(self._local, "active", False):
+            return
+        local = self._local
+        if local.forwards == 0:
+            # Prefill: the prompt, plus any first-round proposals
+            local.proposed += max(0, ids.shape[-1] - local.prompt_len)
+        else:
+            # With the KV cache: last known token plus the proposals
+            local.proposed += ids.shape[-1] - 1
+        local.forwards += 1
+
+    def begin(self, prompt_len):
+        self._local.active = True
+        self._local.prompt_len = prompt_len
+        self._local.forwards = 0
+        self._local.proposed = 0
+
+    def end(self, tokens, seconds):
+        self._local.active = False
+        with self._lock:
+            self.replies += 1
+            self.tokens += tokens
+            self.forwards += self._local.forwards
+            self.proposed += self._local.proposed
+            self.seconds += seconds
+
+    def stats(self) -> dict:
+        with self._lock:
+            accepted = max(0, self.tokens - self.forwards)
+            return {
+                "replies": self.replies,
+                "acceptance_rate": round(accepted / self.proposed, 3) if self.proposed else 0.0,
+                # Tokens per main-model pass; 1.0 means no proposal was ever kept
+                "tokens_per_main_forward": round(self.tokens / self.forwards, 2) if self.forwards else 0.0,
+                "ms_per_token": round(1000 * self.seconds / self.tokens, 1) if self.tokens else 0.0,
+            }
+
 
 class OfflineBackend:
     """Simple pattern based fallback."""
 
-    def reply(self, history, user_message, system_prompt):
+    def reply(self, history, user_message, system_prompt, budget=None):
         user_lower = (user_message or "").lower()
 
         # Greetings and polite phrases
@@ -51,10 +186,23 @@ class OpenAIBackend:
                 self.client = self._OpenAI(api_key=api_key)
             except Exception as e:
                 print(f"OpenAI client init failed: {e}")
+        self.decode_stats = DecodeStats(OPENAI_MAX_TOKENS)
+
+    def after_fork(self, workers=1):
+        # The client's HTTP pool must not be shared with the parent process
+        if self.client:
+            try:
+                self.client = self._OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+            except Exception as e:
+                print(f"OpenAI client re-init failed: {e}")
 
-    def reply(self, history, user_message, system_prompt):
+    def stats(self):
+        return {"decode": self.decode_stats.stats()}
+
+    def reply(self, history, user_message, system_prompt, budget=None):
         if not self.client:
             return None
+        budget = budget or {"sentences": 3, "max_tokens": OPENAI_MAX_TOKENS}
         try:
             messages = [{"role": "system", "content": system_prompt}]
             # include a short recent window
@@ -62,14 +210,40 @@ class OpenAIBackend:
                 messages.append({"role": h["role"], "content": h["content"]})
             messages.append({"role": "user", "content": user_message})
 
-            # Using chat completions for compatibility with many setups
-            resp = self.client.chat.completions.create(
+            # Stream so we can hang up once enough sentences have arrived;
+            # a stop sequence cannot count sentences
+            started = time.monotonic()
+            stream = self.client.chat.completions.create(
                 model=os.getenv("OPENAI_MODEL", "gpt-3.5-turbo"),
                 messages=messages,
                 temperature=0.7,
-                max_tokens=220,
+                max_tokens=budget["max_tokens"],
+                stream=True,
             )
-            return resp.choices[0].message.content.strip()
+            text = ""
+            chunks = 0
+            finish = None
+            early = False
+            try:
+                for chunk in stream:
+                    if not chunk.choices:
+                        continue
+                    finish = chunk.choices[0].finish_reason or finish
+                    delta = chunk.choices[0].delta.content or ""
+                    if not delta:
+                        continue
+                    text += delta
+                    chunks += 1
+                    if count_sentences(text) >= budget["sentences"]:
+                        early = True
+                        break
+            finally:
+                stream.close()
+            cut_off = finish == "length"
+            # One content chunk is one token for chat completions streams
+            self.decode_stats.record(chunks, time.monotonic() - started,
+                                     sentence_stop=early, cut_off=cut_off)
+            return trim_sentences(text, budget["sentences"], cut_off=cut_off) or None
         except Exception as e:
             print(f"OpenAI call failed: {e}")
             return None
@@ -80,6 +254,9 @@ class HuggingFaceBackend:
 
     def __init__(self):
         self.model = None
+        self._workers = 1
+        self._executor = None
+        self._executor_lock = threading.Lock()
         try:
             from transformers import AutoModelForCausalLM, AutoTokenizer
             import torch  # noqa
@@ -88,14 +265,135 @@ class HuggingFaceBackend:
             self._torch = __import__("torch")
             model_name = os.getenv("HF_MODEL", "microsoft/DialoGPT-small")
             self.tokenizer = self._AutoTokenizer.from_pretrained(model_name)
-            self.model = self._AutoModelForCausalLM.from_pretrained(model_name)
+            # low_cpu_mem_usage maps safetensors checkpoints straight into
+            # parameters (no random init, no second copy), which keeps the
+            # weights in pages forked workers can share.
+            self.model = self._AutoModelForCausalLM.from_pretrained(model_name, low_cpu_mem_usage=True)
+            self.model.eval()
+            self.model.requires_grad_(False)
             self.tokenizer.pad_token = self.tokenizer.eos_token
         except Exception as e:
             print(f"HuggingFace init failed: {e}")
+        self.decode_stats = DecodeStats(HF_MAX_NEW_TOKENS)
+        self._init_assist()
+
+    def _init_assist(self):
+        """
+        Optional assisted decoding (HF_ASSIST):
+        "draft"  - a smaller model sharing the tokenizer (HF_DRAFT_MODEL)
+                   proposes tokens the main model verifies in one pass;
+        "lookup" - proposals are n-grams copied from the prompt, which for
+                   chat often repeats the user's own words.
+        Verification keeps the main model's sampling distribution.
+        """
+        self.assist = os.getenv("HF_ASSIST", "").lower()
+        self.assistant_model = None
+        self.assist_stats = None
+        if not self.model or self.assist not in ("draft", "lookup"):
+            self.assist = ""
+            return
+        if self.assist == "draft":
+            draft_name = os.getenv("HF_DRAFT_MODEL", "")
+            try:
+                self.assistant_model = self._AutoModelForCausalLM.from_pretrained(draft_name, low_cpu_mem_usage=True)
+                self.assistant_model.eval()
+                self.assistant_model.requires_grad_(False)
+            except Exception as e:
+                print(f"Draft model init failed, assisted decoding off: {e}")
+                self.assist = ""
+                return
+        self.assist_stats = AssistStats()
+        self.model.register_forward_pre_hook(self.assist_stats.hook, with_kwargs=True)
 
-    def reply(self, history, user_message, system_prompt):
+    def after_fork(self, workers=1):
+        """
+        Called in each gunicorn worker when the model was preloaded.
+        No inference ever runs in the master, so torch's intra-op pool is
+        first created here, sized to this worker's share of the cores.
+        """
+        if not self.model:
+            return
+        self._workers = max(1, workers)
+        self._torch.set_num_threads(self._thread_budget())
+
+    def _thread_budget(self):
+        return int(os.getenv("TORCH_THREADS", "0")) or max(1, (os.cpu_count() or 1) // self._workers)
+
+    def _get_executor(self):
+        # Created on first use so its threads are started in the worker,
+        # never in a preloading gunicorn master (threads do not survive fork)
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    from services.inference import InferenceExecutor
+                    slots = int(os.getenv("HF_SLOTS", "1"))
+                    per_slot = int(os.getenv("HF_THREADS_PER_SLOT", "0")) or max(1, self._thread_budget() // slots)
+                    self._executor = InferenceExecutor(
+                        self._torch, slots=slots, threads_per_slot=per_slot,
+                        pin_cores=os.getenv("HF_PIN_CORES", "0") == "1",
+                    )
+        return self._executor
+
+    def stats(self):
+        info = {
+            "inference": self._executor.stats() if self._executor else {},
+            "decode": self.decode_stats.stats(),
+        }
+        if self.assist_stats:
+            info["assist"] = dict(self.assist_stats.stats(), mode=self.assist)
+        return info
+
+    def _sentence_stop(self, prompt_len, sentences):
+        from transformers import StoppingCriteria
+        tokenizer = self.tokenizer
+
+        class SentenceStop(StoppingCriteria):
+            """Stop once the reply holds the target number of sentences."""
+
+            def __call__(self, input_ids, scores, **kwargs):
+                text = tokenizer.decode(input_ids[0][prompt_len:], skip_special_tokens=True)
+                return count_sentences(text) >= sentences
+
+        return SentenceStop()
+
+    def _generate(self, inputs, budget, deadline):
+        from transformers import StoppingCriteriaList
+        stop = StoppingCriteriaList([self._sentence_stop(inputs.shape[1], budget["sentences"])])
+        assist = {}
+        if self.assist == "draft":
+            assist["assistant_model"] = self.assistant_model
+        elif self.assist == "lookup":
+            assist["prompt_lookup_num_tokens"] = int(os.getenv("HF_LOOKUP_TOKENS", "10"))
+        if self.assist_stats:
+            self.assist_stats.begin(inputs.shape[1])
+        started = time.monotonic()
+        output = None
+        try:
+            # no_grad is thread local, so it has to be entered in the slot thread
+            with self._torch.no_grad():
+                output = self.model.generate(
+                    inputs,
+                    max_length=min(768, inputs.shape[1] + budget["max_tokens"]),
+                    temperature=0.8,
+                    do_sample=True,
+                    top_p=0.9,
+                    pad_token_id=self.tokenizer.eos_token_id,
+                    stopping_criteria=stop,
+                    # Stop at the caller's deadline instead of finishing a
+                    # reply nobody will read and holding the slot meanwhile
+                    max_time=max(0.1, deadline - time.monotonic()),
+                    **assist,
+                )
+            return output
+        finally:
+            if self.assist_stats:
+                tokens = output.shape[1] - inputs.shape[1] if output is not None else 0
+                self.assist_stats.end(tokens, time.monotonic() - started)
+
+    def reply(self, history, user_message, system_prompt, budget=None):
         if not self.model:
             return None
+        budget = budget or {"sentences": 3, "max_tokens": HF_MAX_NEW_TOKENS}
         try:
             ctx = []
             for h in history[-3:]:
@@ -106,17 +404,22 @@ class HuggingFaceBackend:
 
             prompt = "\n".join(ctx)
             inputs = self.tokenizer.encode(prompt, return_tensors="pt", max_length=512, truncation=True)
-            with self._torch.no_grad():
-                output = self.model.generate(
-                    inputs,
-                    max_length=min(768, inputs.shape[1] + 70),
-                    temperature=0.8,
-                    do_sample=True,
-                    top_p=0.9,
-                    pad_token_id=self.tokenizer.eos_token_id,
-                )
-            text = self.tokenizer.decode(output[0][inputs.shape[1]:], skip_special_tokens=True)
-            return text.strip() or None
+            started = time.monotonic()
+            output = self._get_executor().run(lambda deadline: self._generate(inputs, budget, deadline),
+                                              float(os.getenv("HF_DEADLINE", "20")))
+            if output is None:
+                print("HuggingFace generation missed its deadline", flush=True)
+                return None
+            new_tokens = output[0][inputs.shape[1]:]
+            text = self.tokenizer.decode(new_tokens, skip_special_tokens=True)
+            early = count_sentences(text) >= budget["sentences"]
+            # Without EOS and short of the target, the length cap or the
+            # deadline ended the reply mid-thought
+            cut_off = not early and (len(new_tokens) == 0
+                                     or int(new_tokens[-1]) != self.tokenizer.eos_token_id)
+            self.decode_stats.record(len(new_tokens), time.monotonic() - started,
+                                     sentence_stop=early, cut_off=cut_off)
+            return trim_sentences(text, budget["sentences"], cut_off=cut_off) or None
         except Exception as e:
             print(f"HuggingFace call failed: {e}")
             return None
@@ -0,0 +1,105 @@
+import os
+import queue
+import threading
+import time
+
+
+class _Job:
+    __slots__ = ("fn", "deadline", "done", "result", "error", "cancelled")
+
+    def __init__(self, fn, deadline):
+        self.fn = fn
+        self.deadline = deadline
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.cancelled = False
+
+
+class InferenceExecutor:
+    """
+    Fixed set of generation slots fed from one FIFO queue.
+    Each slot is a thread with its own torch intra-op thread count and,
+    optionally, its own partition of the CPU cores, so concurrent
+    generations split the machine instead of all fighting for every core.
+    Jobs that wait past their deadline are dropped and the caller falls back.
+    """
+
+    def __init__(self, torch, slots=1, threads_per_slot=1, pin_cores=False):
+        self._torch = torch
+        self.slots = max(1, slots)
+        self.threads_per_slot = max(1, threads_per_slot)
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self.running = 0
+        self.completed = 0
+        self.expired = 0
+
+        partitions = [None] * self.slots
+        if pin_cores and hasattr(os, "sched_getaffinity"):
+            cores = sorted(os.sched_getaffinity(0))
+            size = max(1, len(cores) // self.slots)
+            partitions = [set(cores[i * size:(i + 1) * size]) or None for i in range(self.slots)]
+
+        for i in range(self.slots):
+            t = threading.Thread(target=self._run_slot, args=(partitions[i],),
+                                 name=f"inference-slot-{i}", daemon=True)
+            t.start()
+
+    def _run_slot(self, cores):
+        # On Linux pid 0 means the calling thread, so this pins only the slot
+        if cores:
+            try:
+                os.sched_setaffinity(0, cores)
+            except OSError as e:
+                print(f"Core pinning failed: {e}", flush=True)
+        # With torch's OpenMP backend the thread count applies to parallel
+        # regions started from this thread
+        self._torch.set_num_threads(self.threads_per_slot)
+
+        while True:
+            job = self._queue.get()
+            if job.cancelled or time.monotonic() > job.deadline:
+                with self._lock:
+                    self.expired += 1
+                job.done.set()
+                continue
+            with self._lock:
+                self.running += 1
+            try:
+                job.result = job.fn(job.deadline)
+            except Exception as e:
+                job.error = e
+            finally:
+                with self._lock:
+                    self.running -= 1
+                    self.completed += 1
+                job.done.set()
+
+    def run(self, fn, timeout):
+        """
+        Queue fn and wait for it. fn is called with the job's absolute
+        time.monotonic() deadline so it can stop its own work (e.g.
+        generate(max_time=...)) rather than run on after the caller gave up.
+        Returns None if it could not start (or finish) within timeout
+        seconds; exceptions from fn are re-raised.
+        """
+        job = _Job(fn, time.monotonic() + timeout)
+        self._queue.put(job)
+        if not job.done.wait(timeout):
+            job.cancelled = True
+            return None
+        if job.error:
+            raise job.error
+        return job.result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "slots": self.slots,
+                "threads_per_slot": self.threads_per_slot,
+                "queued": self._queue.qsize(),
+                "running": self.running,
+                "completed": self.completed,
+                "expired": self.expired,
+            }
@@ -0,0 +1,23 @@
+import threading
+import zlib
+
+# -------------------------------------------------
+# Sharded per-session locks
+# -------------------------------------------------
+# All per-sid state (history, prefs, notes/goals, CBT exercise steps,
+# crisis stream, summary) is only touched while holding that sid's lock.
+# Turns release it around the model call (see main._chat_turn), so it
+# only covers short state updates and sessions sharing a shard contend
+# for microseconds, while the table stays a fixed size.
+
+LOCK_SHARDS = 64
+
+_LOCKS = [threading.RLock() for _ in range(LOCK_SHARDS)]
+
+# Shared, non-sid state (the log file)
+LOG_LOCK = threading.Lock()
+
+
+def session_lock(sid: str) -> threading.RLock:
+    # crc32 rather than hash(): stable across processes and restarts
+    return _LOCKS[zlib.crc32((sid or "").encode("utf-8")) % LOCK_SHARDS]
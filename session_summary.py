@@ -0,0 +1,122 @@
+import json
+from collections import Counter, deque
+
+# -------------------------------------------------
+# Per-session recap state, updated once per turn
+# -------------------------------------------------
+
+RECENT_MESSAGES = 8      # user messages shown in the recap
+TIMELINE_RUNS = 50       # run-length mood segments kept per session
+
+# SUMMARY_STATE[sid] = {
+#   "recent": deque of last user messages,
+#   "mood_counts": Counter(mood -> turns),
+#   "timeline": deque of [mood, run_length],
+#   "exercises": list of completed exercise names,
+#   "crisis_turns": int, "last_crisis_turn": int|None,
+#   "turns": int,
+# }
+SUMMARY_STATE = {}
+
+
+def _new_state() -> dict:
+    return {
+        "recent": deque(maxlen=RECENT_MESSAGES),
+        "mood_counts": Counter(),
+        "timeline": deque(maxlen=TIMELINE_RUNS),
+        "exercises": [],
+        "crisis_turns": 0,
+        "last_crisis_turn": None,
+        "turns": 0,
+    }
+
+
+def _apply(state: dict, user_message: str, mood: str, crisis: bool = False, exercise: str = None):
+    mood = mood or "neutral"
+    state["turns"] += 1
+    state["recent"].append(user_message)
+    state["mood_counts"][mood] += 1
+
+    timeline = state["timeline"]
+    if timeline and timeline[-1][0] == mood:
+        timeline[-1][1] += 1
+    else:
+        timeline.append([mood, 1])
+
+    if crisis:
+        state["crisis_turns"] += 1
+        state["last_crisis_turn"] = state["turns"]
+    if exercise:
+        state["exercises"].append(exercise)
+
+
+def start_session(sid: str):
+    """Fresh session: nothing to rebuild."""
+    SUMMARY_STATE[sid] = _new_state()
+
+
+def rebuild_from_log(sid: str, log_file: str) -> dict:
+    """
+    Replay logged turns for a session that outlived the process
+    (e.g. a cookie from before a restart). One pass over the log.
+    """
+    state = _new_state()
+    try:
+        with open(log_file, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if entry.get("sid") != sid:
+                    continue
+                _apply(state, entry.get("user_message", ""), entry.get("mood"),
+                       crisis=bool(entry.get("crisis")), exercise=entry.get("exercise"))
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"Summary rebuild error: {e}", flush=True)
+    SUMMARY_STATE[sid] = state
+    return state
+
+
+def ensure_state(sid: str, log_file: str) -> dict:
+    state = SUMMARY_STATE.get(sid)
+    if state is None:
+        state = rebuild_from_log(sid, log_file)
+    return state
+
+
+def record_turn(sid: str, log_file: str, user_message: str, mood: str,
+                crisis: bool = False, exercise: str = None):
+    _apply(ensure_state(sid, log_file), user_message, mood, crisis=crisis, exercise=exercise)
+
+
+def summary_payload(sid: str, log_file: str) -> dict:
+    """
+    Serialize the session state into the /session-summary response.
+    Keeps the original "response"/"mood" keys for the chat UI.
+    """
+    state = ensure_state(sid, log_file)
+    if not state["turns"]:
+        return {"response": "We have not chatted yet. Say hi to start.", "mood": "neutral"}
+
+    dominant = state["mood_counts"].most_common(1)[0][0]
+    bullets = "\n".join([f"• {m}" for m in state["recent"]])
+    summary = f"Here is a quick recap of what you shared today:\n{bullets}"
+    summary += f"\n\nYour mood has mostly been {dominant}."
+    if state["exercises"]:
+        summary += f" You completed: {', '.join(state['exercises'])}."
+    summary += "\n\nWould you like a small next step to try?"
+
+    return {
+        "response": summary,
+        "mood": dominant,
+        "mood_counts": dict(state["mood_counts"]),
+        "mood_timeline": [list(run) for run in state["timeline"]],
+        "exercises_completed": list(state["exercises"]),
+        "crisis": state["crisis_turns"] > 0,
+        "crisis_turns": state["crisis_turns"],
+        "last_crisis_turn": state["last_crisis_turn"],
+        "turns": state["turns"],
+    }
@@ -0,0 +1,148 @@
+"""
+CPU benchmark for the local-generation executor layout.
+
+Loads HF_MODEL once, then for each slots x threads layout runs the same
+batch of CareBear-style prompts through an InferenceExecutor and reports
+decode tokens/sec and request latency. Use it on the target instance to
+choose HF_SLOTS / HF_THREADS_PER_SLOT (and HF_PIN_CORES).
+
+    python tests/bench_inference.py --layouts 1x8,2x4,4x2,8x1 --requests 16
+
+Every request decodes exactly --tokens new tokens so layouts are compared
+on equal work. Needs torch and transformers.
+
+With --assist draft|lookup each layout is also run with assisted decoding
+(HF_ASSIST) and compared against plain decoding on wall-clock tokens/sec
+and per-request ms/token, which is the speedup that matters:
+
+    python tests/bench_inference.py --layouts 2x4 --assist draft --draft-model distilgpt2
+    python tests/bench_inference.py --layouts 2x4 --assist lookup --lookup-tokens 10
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from services.inference import InferenceExecutor  # noqa: E402
+
+PROMPTS = [
+    "User: hi\nBot: Hi there. How are you feeling today?\nUser: honestly a bit low, work has been a lot\nBot:",
+    "User: I can't sleep, my mind won't stop\nBot:",
+    "User: I had a really good day today!\nBot: That is wonderful to hear.\nUser: I finally finished my project\nBot:",
+    "User: I'm nervous about my exam tomorrow\nBot: It is okay to feel anxious.\nUser: what if I fail\nBot:",
+    "User: the weather is so grey lately\nBot:",
+    "User: I feel lonely since I moved\nBot: That sounds hard.\nUser: I don't know anyone here yet\nBot:",
+]
+
+
+def default_layouts():
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+    layouts = []
+    slots = 1
+    while slots <= cores:
+        layouts.append((slots, cores // slots))
+        slots *= 2
+    return layouts
+
+
+def parse_layouts(spec):
+    return [tuple(int(x) for x in part.lower().split("x")) for part in spec.split(",") if part]
+
+
+def bench(torch, model, tokenizer, slots, threads, requests, tokens, pin, assist=None):
+    executor = InferenceExecutor(torch, slots=slots, threads_per_slot=threads, pin_cores=pin)
+    encoded = [tokenizer.encode(p, return_tensors="pt") for p in PROMPTS]
+    assist = assist or {}
+
+    def generate(inputs):
+        with torch.no_grad():
+            return model.generate(inputs, max_new_tokens=tokens, min_new_tokens=tokens,
+                                  do_sample=True, temperature=0.8, top_p=0.9,
+                                  pad_token_id=tokenizer.eos_token_id, **assist)
+
+    # Warm each slot so first-call overheads do not skew the run
+    for i in range(slots):
+        executor.run(lambda deadline: generate(encoded[0]), 600)
+
+    latencies = []
+    guard = threading.Lock()
+
+    def client(i):
+        inputs = encoded[i % len(encoded)]
+        started = time.monotonic()
+        executor.run(lambda deadline: generate(inputs), 600)
+        with guard:
+            latencies.append(time.monotonic() - started)
+
+    started = time.monotonic()
+    pool = [threading.Thread(target=client, args=(i,)) for i in range(requests)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    wall = time.monotonic() - started
+    latencies.sort()
+    return {
+        "tokens_per_sec": requests * tokens / wall,
+        "ms_per_token": 1000 * sum(latencies) / len(latencies) / tokens,
+        "p50": latencies[len(latencies) // 2],
+        "p99": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--layouts", default="", help="comma list of SLOTSxTHREADS, e.g. 1x8,4x2")
+    parser.add_argument("--requests", type=int, default=16)
+    parser.add_argument("--tokens", type=int, default=40)
+    parser.add_argument("--pin", action="store_true", help="pin each slot to its own cores")
+    parser.add_argument("--assist", choices=["draft", "lookup"], help="also run with assisted decoding")
+    parser.add_argument("--draft-model", default=os.getenv("HF_DRAFT_MODEL", ""),
+                        help="draft model for --assist draft (must share the tokenizer)")
+    parser.add_argument("--lookup-tokens", type=int, default=int(os.getenv("HF_LOOKUP_TOKENS", "10")))
+    args = parser.parse_args()
+
+    try:
+        import torch
+        from transformers import AutoModelForCausalLM, AutoTokenizer
+    except ImportError as e:
+        sys.exit(f"bench_inference needs torch and transformers: {e}")
+
+    model_name = os.getenv("HF_MODEL", "microsoft/DialoGPT-small")
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModelForCausalLM.from_pretrained(model_name, low_cpu_mem_usage=True).eval()
+
+    assist = None
+    if args.assist == "draft":
+        if not args.draft_model:
+            sys.exit("--assist draft needs --draft-model or HF_DRAFT_MODEL")
+        draft = AutoModelForCausalLM.from_pretrained(args.draft_model, low_cpu_mem_usage=True).eval()
+        assist = {"assistant_model": draft}
+    elif args.assist == "lookup":
+        assist = {"prompt_lookup_num_tokens": args.lookup_tokens}
+
+    layouts = parse_layouts(args.layouts) if args.layouts else default_layouts()
+    print(f"{model_name}, {args.requests} requests x {args.tokens} tokens, pin={args.pin}")
+    results = []
+    for slots, threads in layouts:
+        # Each layout gets fresh slot threads; old ones idle on their queue
+        r = bench(torch, model, tokenizer, slots, threads, args.requests, args.tokens, args.pin)
+        results.append(((slots, threads), r))
+        print(f"{slots}x{threads}: {r['tokens_per_sec']:.1f} tok/s  {r['ms_per_token']:.1f} ms/token  "
+              f"p50 {r['p50']:.2f}s  p99 {r['p99']:.2f}s")
+        if assist:
+            a = bench(torch, model, tokenizer, slots, threads, args.requests, args.tokens, args.pin, assist)
+            print(f"{slots}x{threads} +{args.assist}: {a['tokens_per_sec']:.1f} tok/s  "
+                  f"{a['ms_per_token']:.1f} ms/token  p50 {a['p50']:.2f}s  p99 {a['p99']:.2f}s  "
+                  f"speedup x{a['tokens_per_sec'] / r['tokens_per_sec']:.2f}")
+
+    (slots, threads), best = max(results, key=lambda x: x[1]["tokens_per_sec"])
+    print(f"best: HF_SLOTS={slots} HF_THREADS_PER_SLOT={threads} ({best['tokens_per_sec']:.1f} tok/s)")
+
+
+if __name__ == "__main__":
+    main()
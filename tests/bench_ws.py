@@ -0,0 +1,74 @@
+"""
+Per-message cost of the chat transports against a running server.
+
+Sends the same --turns messages three ways on one session: POST /chat one
+at a time, the /ws socket one frame at a time, and the socket pipelined
+(every frame sent before the first reply is read). Reports ms/msg.
+
+    OPENAI_API_KEY= gunicorn -c gunicorn.conf.py -w 1 main:app
+    python tests/bench_ws.py --url http://127.0.0.1:8000 --turns 300
+
+Run it against the offline backend, as above, to measure the transport
+rather than the model. Needs flask-sock (and so simple-websocket).
+"""
+import argparse
+import http.cookiejar
+import json
+import sys
+import time
+import urllib.request
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--turns", type=int, default=300)
+    args = parser.parse_args()
+
+    try:
+        import simple_websocket
+    except ImportError as e:
+        sys.exit(f"bench_ws needs simple-websocket: {e}")
+
+    base = args.url.rstrip("/")
+    jar = http.cookiejar.CookieJar()
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(jar))
+    # The page mints the session cookie the socket upgrade then carries
+    opener.open(base + "/").read()
+    cookie = "; ".join(f"{c.name}={c.value}" for c in jar)
+    turns = args.turns
+    messages = [f"thanks, tell me about the weather {i}" for i in range(turns)]
+
+    started = time.perf_counter()
+    for m in messages:
+        req = urllib.request.Request(base + "/chat", data=json.dumps({"message": m}).encode(),
+                                     headers={"Content-Type": "application/json"})
+        json.loads(opener.open(req).read())
+    post = (time.perf_counter() - started) / turns
+
+    ws = simple_websocket.Client.connect("ws" + base[len("http"):] + "/ws", headers={"Cookie": cookie})
+    try:
+        started = time.perf_counter()
+        for seq, m in enumerate(messages, 1):
+            ws.send(json.dumps({"type": "chat", "seq": seq, "message": m}))
+            reply = json.loads(ws.receive())
+            assert reply["seq"] == seq, reply
+        sequential = (time.perf_counter() - started) / turns
+
+        started = time.perf_counter()
+        for seq, m in enumerate(messages, turns + 1):
+            ws.send(json.dumps({"type": "chat", "seq": seq, "message": m}))
+        for seq in range(turns + 1, 2 * turns + 1):
+            reply = json.loads(ws.receive())
+            assert reply["seq"] == seq, reply
+        pipelined = (time.perf_counter() - started) / turns
+    finally:
+        ws.close()
+
+    print(f"{turns} turns each: POST /chat {post * 1000:.2f} ms/msg, "
+          f"WebSocket {sequential * 1000:.2f} ms/msg, "
+          f"WebSocket pipelined {pipelined * 1000:.2f} ms/msg")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Overload test for admission control.
+
+A stub backend serializes calls behind one lock with a fixed service
+time, which is how a single local model behaves. Many threads then send
+turns at once, first with admission disabled and then enabled, while
+crisis messages are sent alongside.
+
+    python tests/load_admission.py [--threads 16] [--turns 5] [--service 0.2]
+
+With admission on, p99 must stay under --bound seconds and no crisis
+reply may wait on the backend. Exits non-zero otherwise.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ["CHAT_LOG_FILE"] = os.path.join(tempfile.mkdtemp(), "load_logs.jsonl")
+
+import main  # noqa: E402
+from services.admission import AdmissionController  # noqa: E402
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def run(admission, threads, turns, service):
+    main.admission = admission
+    model = threading.Lock()
+
+    def stub_reply(history, user_message, system_prompt, budget=None):
+        with model:
+            time.sleep(service)
+        return "Model reply."
+
+    main.backend.reply = stub_reply
+    latencies = []
+    crisis_latencies = []
+    guard = threading.Lock()
+
+    def worker(i, crisis):
+        client = main.app.test_client()
+        with client.session_transaction() as s:
+            s["sid"] = f"{'crisis' if crisis else 'load'}-{id(admission)}-{i}"
+        for _ in range(turns):
+            message = "I want to die" if crisis else "I feel low today"
+            started = time.monotonic()
+            r = client.post("/chat", json={"message": message})
+            elapsed = time.monotonic() - started
+            assert r.status_code == 200
+            if crisis:
+                assert r.get_json().get("crisis")
+            with guard:
+                (crisis_latencies if crisis else latencies).append(elapsed)
+
+    pool = [threading.Thread(target=worker, args=(i, False)) for i in range(threads)]
+    pool += [threading.Thread(target=worker, args=(i, True)) for i in range(2)]
+    started = time.monotonic()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return {
+        "p50": percentile(latencies, 0.5),
+        "p99": percentile(latencies, 0.99),
+        "crisis_max": max(crisis_latencies),
+        "wall": time.monotonic() - started,
+        "stats": admission.stats(),
+    }
+
+
+def report(label, r):
+    s = r["stats"]
+    print(f"{label:>13}: p50 {r['p50']:.3f}s  p99 {r['p99']:.3f}s  crisis max {r['crisis_max']:.3f}s  "
+          f"wall {r['wall']:.1f}s  admitted {s['admitted']}  shed {s['shed']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--service", type=float, default=0.2, help="stub backend seconds per call")
+    parser.add_argument("--max-in-flight", type=int, default=2)
+    parser.add_argument("--max-latency", type=float, default=1.0)
+    parser.add_argument("--bound", type=float, default=1.5, help="required p99 with admission on")
+    args = parser.parse_args()
+
+    off = run(AdmissionController(0, 0), args.threads, args.turns, args.service)
+    report("admission off", off)
+    on = run(AdmissionController(args.max_in_flight, args.max_latency), args.threads, args.turns, args.service)
+    report("admission on", on)
+
+    assert on["p99"] < args.bound, f"p99 {on['p99']:.3f}s exceeds {args.bound}s"
+    assert on["crisis_max"] < args.service, "a crisis reply waited on the backend"
+    print("ok")
@@ -0,0 +1,106 @@
+"""
+Stress test for the per-session state layer.
+
+Runs many /chat and /goals requests in parallel through the Flask test
+client: several threads share one sid, the rest each own a sid. The
+backend is stubbed with a short sleep so turns overlap inside the model
+call, where the session lock is released.
+
+    python tests/stress_sessions.py [--threads 16] [--shared 8] [--turns 25]
+
+Exits non-zero if an invariant breaks.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+LOG_FILE = os.path.join(tempfile.mkdtemp(), "stress_logs.jsonl")
+os.environ["CHAT_LOG_FILE"] = LOG_FILE
+os.environ.setdefault("ADMISSION_MAX_IN_FLIGHT", "0")
+os.environ.setdefault("ADMISSION_MAX_LATENCY", "0")
+
+import main  # noqa: E402
+from session_summary import SUMMARY_STATE  # noqa: E402
+
+
+def stub_reply(history, user_message, system_prompt, budget=None):
+    time.sleep(0.001)
+    return "Thanks for sharing that."
+
+
+def worker(sid, name, turns, errors):
+    client = main.app.test_client()
+    with client.session_transaction() as s:
+        s["sid"] = sid
+    try:
+        for i in range(turns):
+            r = client.post("/chat", json={"message": f"{name} message {i}"})
+            assert r.status_code == 200, r.status_code
+            r = client.post("/goals", json={"goal": f"{name} goal {i}"})
+            assert r.status_code == 201, r.status_code
+    except Exception as e:
+        errors.append(f"{name}: {e!r}")
+
+
+def check_session(sid, senders, turns, strict_order):
+    history = main.USER_HISTORY[sid]
+    roles = Counter(h["role"] for h in history)
+    expected = len(senders) * turns
+    assert roles["user"] == expected, f"{sid}: {roles['user']} user turns, expected {expected}"
+    assert roles["assistant"] == expected, f"{sid}: {roles['assistant']} replies, expected {expected}"
+
+    user_msgs = Counter(h["content"] for h in history if h["role"] == "user")
+    want = Counter(f"{n} message {i}" for n in senders for i in range(turns))
+    assert user_msgs == want, f"{sid}: user messages lost or duplicated"
+
+    if strict_order:
+        # A single client sends sequentially, so its turns must alternate
+        assert all(h["role"] == ("user", "assistant")[i % 2] for i, h in enumerate(history)), \
+            f"{sid}: history does not alternate"
+
+    goals = main.USER_GOALS[sid]
+    assert [g["id"] for g in goals] == list(range(expected)), f"{sid}: goal ids not contiguous"
+    assert SUMMARY_STATE[sid]["turns"] == expected, f"{sid}: summary turn count off"
+
+
+def run(threads, shared, turns):
+    main.backend.reply = stub_reply
+    errors = []
+    plan = [("shared" if i < shared else f"solo-{i}", f"t{i}") for i in range(threads)]
+    pool = [threading.Thread(target=worker, args=(sid, name, turns, errors)) for sid, name in plan]
+    started = time.monotonic()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.monotonic() - started
+    assert not errors, errors
+
+    by_sid = {}
+    for sid, name in plan:
+        by_sid.setdefault(sid, []).append(name)
+    for sid, senders in by_sid.items():
+        check_session(sid, senders, turns, strict_order=len(senders) == 1)
+
+    with open(LOG_FILE, encoding="utf-8") as f:
+        lines = [line for line in f]
+    assert len(lines) == threads * turns, f"{len(lines)} log lines, expected {threads * turns}"
+    assert all(line.endswith("\n") and line.startswith("{") for line in lines), "torn log line"
+
+    print(f"ok: {threads} threads ({shared} on one sid) x {turns} turns in {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--shared", type=int, default=8)
+    parser.add_argument("--turns", type=int, default=25)
+    args = parser.parse_args()
+    run(args.threads, args.shared, args.turns)